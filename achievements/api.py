@@ -0,0 +1,335 @@
+"""
+A lean JSON API for integrations, without the MassForms and page rendering of the views. Everything works on
+batches: objects are requested by a list of ids, and Achievements are awarded and revoked many at a time.
+Responses are compact and column-based ({"fields": [...], "rows": [[...], ...]}), which keeps them small and
+compresses well if the GZipMiddleware is enabled. Only the requested fields are loaded, so e.g. the text is
+only read when it is asked for.
+Every batch is read with a single query and written in a single transaction, so it always sees (and leaves)
+a consistent state.
+Clients authenticate with an API key in the X-Api-Key header (see the setting ACHIEVEMENTS_API_KEYS), which
+doesn't depend on cookies, so the views don't need CSRF protection. Writing always needs a key, reading also
+works with the session of a logged in user.
+"""
+import json
+from django.conf import settings
+from django.contrib.auth.models import User as DjangoUser
+from django.http import HttpResponse, HttpResponseBadRequest, HttpResponseForbidden, HttpResponseNotAllowed
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.csrf import csrf_exempt
+from treeio.core.models import User
+from achievements.models import Prototype, Achievement
+from achievements.archive import archive_ids
+from achievements.caching import commit_and_invalidate
+from achievements.holders import get_holders
+from achievements.routers import read, route_database
+
+# the most objects one request may ask for or change
+MAX_BATCH = 500
+# the longest text an Achievement can have
+MAX_TEXT_LENGTH = Achievement._meta.get_field('text').max_length
+
+# fields which can be requested, mapped to the names for values_list()
+PROTOTYPE_FIELDS = {'id': 'pk', 'title': 'title', 'text': 'text', 'badge': 'badge', 'icon': 'icon',
+                    'steps': 'steps'}
+PROTOTYPE_DEFAULT_FIELDS = ['id', 'title']
+ACHIEVEMENT_FIELDS = {'id': 'pk', 'user': 'user', 'prototype': 'prototype', 'text': 'text',
+                      'timestamp': 'timestamp'}
+ACHIEVEMENT_DEFAULT_FIELDS = ['id', 'user', 'prototype', 'timestamp']
+
+
+class _BadRequest(Exception):
+    """ Raised when the parameters of a request are invalid, the message is sent back. """
+
+
+def _json(data):
+    """ A response with data as compact JSON. """
+    return HttpResponse(json.dumps(data, separators=(',', ':')), content_type='application/json')
+
+
+def _error(message):
+    """ A 400 response with the message as JSON. """
+    return HttpResponseBadRequest(json.dumps({'error': message}), content_type='application/json')
+
+
+def _forbidden(message):
+    """ A 403 response with the message as JSON. """
+    return HttpResponseForbidden(json.dumps({'error': message}), content_type='application/json')
+
+
+def _encode(value):
+    """ Turn values that JSON doesn't know (dates, files) into strings. """
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def _get_ids(value):
+    """
+    Parse a comma separated list of ids, or a list of ids from a JSON body.
+
+    Arguments:
+    value -- a string like '1,2,3' or a list
+    """
+    if isinstance(value, basestring):
+        value = [part for part in value.split(',') if part.strip()]
+    try:
+        ids = [int(pk) for pk in value]
+    except (TypeError, ValueError):
+        raise _BadRequest('ids must be a list of numbers')
+    if len(ids) > MAX_BATCH:
+        raise _BadRequest('at most %d ids per request' % MAX_BATCH)
+    return ids
+
+
+def _get_fields(request, available, default):
+    """
+    Get the list of fields the client wants.
+
+    Arguments:
+    request -- a Django Request object
+    available -- the dictionary of fields which can be requested
+    default -- the fields returned if the client doesn't ask for specific ones
+    """
+    if not request.GET.get('fields'):
+        return default
+    fields = [field.strip() for field in request.GET['fields'].split(',') if field.strip()]
+    for field in fields:
+        if field not in available:
+            raise _BadRequest('unknown field: %s' % field)
+    return fields
+
+
+def _rows(queryset, fields, available):
+    """ Fetch only the requested fields of a QuerySet with one query and return the column-based result. """
+    values = queryset.values_list(*[available[field] for field in fields])
+    return {'fields': fields, 'rows': [[_encode(value) for value in row] for row in values]}
+
+
+def _page(request, queryset, fields, available):
+    """
+    Like _rows, but for listings which can be longer than MAX_BATCH. The objects are sorted by id, and only
+    the MAX_BATCH after the id in the GET parameter 'after' are returned. If there may be more, the result
+    contains the id to continue after as 'next'.
+
+    Arguments:
+    request -- a Django Request object
+    queryset -- the QuerySet to be listed
+    fields -- the requested fields
+    available -- the dictionary of fields which can be requested
+    """
+    try:
+        after = int(request.GET.get('after', 0))
+    except ValueError:
+        raise _BadRequest('after must be an id')
+    values = list(queryset.filter(pk__gt=after).order_by('pk')
+                  .values_list('pk', *[available[field] for field in fields])[:MAX_BATCH])
+    result = {'fields': fields, 'rows': [[_encode(value) for value in row[1:]] for row in values]}
+    if len(values) == MAX_BATCH:
+        result['next'] = values[-1][0]
+    return result
+
+
+def _read_body(request):
+    """ Parse the JSON body of a POST request. """
+    try:
+        return json.loads(request.raw_post_data)
+    except ValueError:
+        raise _BadRequest('the body must be JSON')
+
+
+def _get_key_user(key):
+    """
+    Get the Django User an API key belongs to, or None if the key is unknown. ACHIEVEMENTS_API_KEYS maps keys to
+    usernames. All keys are compared in constant time, so the response time doesn't give away a valid key.
+
+    Arguments:
+    key -- the key sent by the client
+    """
+    username = None
+    for valid_key, name in getattr(settings, 'ACHIEVEMENTS_API_KEYS', {}).items():
+        if constant_time_compare(key, valid_key):
+            username = name
+    if username is None:
+        return None
+    try:
+        return DjangoUser.objects.get(username=username, is_active=True)
+    except DjangoUser.DoesNotExist:
+        return None
+
+
+def _authenticate(f):
+    """
+    This decorator authenticates API requests. With an API key, the request acts as the User the key belongs to.
+    Without one, only GET requests are allowed, for a logged in User. Since a key has to be sent explicitly
+    with every request, the views are exempt from CSRF protection.
+
+    Arguments:
+    f -- the function that is decorated
+    """
+
+    def wrap(request, *args, **kwargs):
+        """
+        Arguments:
+        request -- the Django-request
+        *args -- catch args to pass them on afterwards
+        **kwargs -- catch kwargs to pass them on afterwards
+        """
+        key = request.META.get('HTTP_X_API_KEY')
+        if key:
+            user = _get_key_user(key)
+            if user is None:
+                return _forbidden('invalid API key')
+            request.user = user
+        elif request.method != 'GET':
+            return _forbidden('writing needs an API key')
+        elif not request.user.is_authenticated():
+            return _forbidden('not logged in')
+        return f(request, *args, **kwargs)
+
+    wrap.__doc__ = f.__doc__
+    wrap.__name__ = f.__name__
+    return csrf_exempt(wrap)
+
+
+def _api_view(f):
+    """
+    This decorator turns _BadRequest into a 400 response, so the views can simply raise it.
+
+    Arguments:
+    f -- the function that is decorated
+    """
+
+    def wrap(request, *args, **kwargs):
+        """
+        Arguments:
+        request -- the Django-request
+        *args -- catch args to pass them on afterwards
+        **kwargs -- catch kwargs to pass them on afterwards
+        """
+        try:
+            return f(request, *args, **kwargs)
+        except _BadRequest as e:
+            return _error(str(e))
+
+    wrap.__doc__ = f.__doc__
+    wrap.__name__ = f.__name__
+    return wrap
+
+
+@_authenticate
+@route_database
+@_api_view
+def prototypes(request):
+    """
+    GET the Prototypes with the given ids (GET parameter 'ids', comma separated), or all of them, MAX_BATCH at
+    a time (see _page). Which fields are returned can be chosen with the GET parameter 'fields'.
+
+    Arguments:
+    request -- a Django Request object
+    """
+    fields = _get_fields(request, PROTOTYPE_FIELDS, PROTOTYPE_DEFAULT_FIELDS)
+    queryset = read(Prototype.objects.filter(trash=False))
+    if 'ids' in request.GET:
+        return _json(_rows(queryset.filter(pk__in=_get_ids(request.GET['ids'])), fields, PROTOTYPE_FIELDS))
+    return _json(_page(request, queryset, fields, PROTOTYPE_FIELDS))
+
+
+@_authenticate
+@route_database
+@_api_view
+def achievements(request):
+    """
+    GET Achievements, filtered by the GET parameters 'ids', 'user' and 'prototype' (all comma separated lists
+    of ids), MAX_BATCH at a time (see _page). Which fields are returned can be chosen with 'fields'.
+    POST a JSON list of objects with 'user', 'prototype' and optionally 'text' to award them all at once. Users
+    who already hold a Prototype are skipped, like in the MassForm.
+
+    Arguments:
+    request -- a Django Request object
+    """
+    if request.method == 'POST':
+        return _create_achievements(request)
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET', 'POST'])
+
+    fields = _get_fields(request, ACHIEVEMENT_FIELDS, ACHIEVEMENT_DEFAULT_FIELDS)
+    queryset = read(Achievement.objects.filter(trash=False))
+    for name, lookup in (('ids', 'pk__in'), ('user', 'user__in'), ('prototype', 'prototype__in')):
+        if name in request.GET:
+            queryset = queryset.filter(**{lookup: _get_ids(request.GET[name])})
+    return _json(_page(request, queryset, fields, ACHIEVEMENT_FIELDS))
+
+
+def _create_achievements(request):
+    """ Award all Achievements in the JSON body of the request, in one transaction. """
+    if not request.user.get_profile().is_admin(module_name='achievements'):
+        return _forbidden('awarding needs admin rights')
+
+    items = _read_body(request)
+    if not isinstance(items, list) or len(items) > MAX_BATCH:
+        raise _BadRequest('the body must be a list of at most %d objects' % MAX_BATCH)
+    awards = []
+    for item in items:
+        try:
+            user_id, prototype_id = int(item['user']), int(item['prototype'])
+            text = item.get('text', '')
+        except (TypeError, ValueError, KeyError, AttributeError):
+            raise _BadRequest('every object needs a numeric user and prototype')
+        if not isinstance(text, basestring) or len(text) > MAX_TEXT_LENGTH:
+            raise _BadRequest('text must be a string of at most %d characters' % MAX_TEXT_LENGTH)
+        awards.append((user_id, prototype_id, text))
+
+    user_ids = set(User.objects.filter(pk__in=set(a[0] for a in awards)).values_list('pk', flat=True))
+    prototype_ids = set(Prototype.objects.filter(pk__in=set(a[1] for a in awards), trash=False)
+                        .values_list('pk', flat=True))
+    for user_id, prototype_id, text in awards:
+        if user_id not in user_ids:
+            raise _BadRequest('unknown user: %d' % user_id)
+        if prototype_id not in prototype_ids:
+            raise _BadRequest('unknown prototype: %d' % prototype_id)
+
+    ids = _award_all(awards)
+    return _json({'fields': ['id'], 'rows': [[pk] for pk in ids]})
+
+
+@commit_and_invalidate
+def _award_all(awards):
+    """
+    Create the Achievements of a list of (user id, prototype id, text) tuples and return their ids. Users who
+    already hold the Prototype, or get it earlier in the same list, are skipped.
+    """
+    holders = {}
+    ids = []
+    for user_id, prototype_id, text in awards:
+        if prototype_id not in holders:
+            holders[prototype_id] = get_holders(prototype_id)
+        if user_id in holders[prototype_id]:
+            continue
+        achievement = Achievement(user_id=user_id, prototype_id=prototype_id, text=text)
+        achievement.save()
+        holders[prototype_id].add(user_id)
+        ids.append(achievement.pk)
+    return ids
+
+
+@_authenticate
+@route_database
+@_api_view
+def revoke(request):
+    """
+    POST a JSON object {"ids": [...]} to revoke (and archive) all those Achievements at once.
+
+    Arguments:
+    request -- a Django Request object
+    """
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    if not request.user.get_profile().is_admin(module_name='achievements'):
+        return _forbidden('revoking needs admin rights')
+
+    body = _read_body(request)
+    if not isinstance(body, dict):
+        raise _BadRequest('the body must be an object with a list of ids')
+    # the Achievements are locked and archived in one transaction, so concurrent requests can't revoke one twice
+    ids = archive_ids(_get_ids(body.get('ids', [])), 'revoked')
+    return _json({'fields': ['id'], 'rows': [[pk] for pk in ids]})
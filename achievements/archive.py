@@ -0,0 +1,105 @@
+"""
+Moves Achievements which don't need to be in the Achievement table anymore into the much smaller table of
+ArchivedAchievement. That is done for revoked Achievements right away, and for trashed and old ones (see the
+setting ACHIEVEMENTS_ARCHIVE_AFTER_DAYS) by the achievements_archive command.
+Since archived Achievements are deleted the normal way, the cache, the search index and everything else that
+listens to the signals of Achievement stays correct. Old Achievements are archived as 'expired', which only moves
+them: their Users still hold them (see ArchivedAchievement.HELD_REASONS).
+Achievements are always read from the primary database and locked before they are moved, so two processes
+archiving at the same time can't archive the same Achievement twice.
+"""
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from achievements.models import Achievement, ArchivedAchievement
+from achievements.caching import commit_and_invalidate
+
+# how many Achievements are archived in one transaction
+BATCH_SIZE = 500
+
+
+def _lock(queryset):
+    """ Read a QuerySet of Achievements from the primary database and lock the rows until the transaction ends. """
+    return queryset.using(DEFAULT_DB_ALIAS).select_for_update()
+
+
+def _move(achievement, reason):
+    """ Copy an Achievement into the archive and delete it (together with its Object). """
+    archived = ArchivedAchievement.objects.create(prototype_id=achievement.prototype_id,
+                                                  user_id=achievement.user_id,
+                                                  text=achievement.text,
+                                                  timestamp=achievement.timestamp,
+                                                  reason=reason)
+    achievement.delete()
+    return archived
+
+
+@commit_and_invalidate
+def archive(achievement, reason):
+    """
+    Archive one Achievement. Returns the ArchivedAchievement, or None if it has already been archived.
+
+    Arguments:
+    achievement -- the Achievement to be archived
+    reason -- why it is archived, one of the keys of ArchivedAchievement.REASONS
+    """
+    locked = list(_lock(Achievement.objects.filter(pk=achievement.pk)))
+    if not locked:
+        return None
+    return _move(locked[0], reason)
+
+
+@commit_and_invalidate
+def archive_ids(ids, reason):
+    """
+    Archive the Achievements with the given ids in one transaction. Returns the ids which were archived, ids
+    that don't exist (anymore) are skipped.
+
+    Arguments:
+    ids -- the ids of the Achievements to be archived
+    reason -- why they are archived, one of the keys of ArchivedAchievement.REASONS
+    """
+    archived = []
+    for achievement in list(_lock(Achievement.objects.filter(pk__in=ids))):
+        # the id is gone once it is deleted
+        archived.append(achievement.pk)
+        _move(achievement, reason)
+    return archived
+
+
+@commit_and_invalidate
+def _archive_batch(queryset, reason):
+    """ Archive the first BATCH_SIZE Achievements of a QuerySet in one transaction. Returns how many. """
+    batch = list(_lock(queryset)[:BATCH_SIZE])
+    for achievement in batch:
+        _move(achievement, reason)
+    return len(batch)
+
+
+def _archive_queryset(queryset, reason):
+    """ Archive everything in a QuerySet, BATCH_SIZE at a time. Returns how many were archived. """
+    count = 0
+    while True:
+        archived = _archive_batch(queryset, reason)
+        if not archived:
+            return count
+        count += archived
+
+
+def archive_old(days=None):
+    """
+    Archive all trashed Achievements, and all which are older than the given number of days. Returns the
+    number of archived Achievements.
+
+    Arguments:
+    days -- the age in days, defaults to the setting ACHIEVEMENTS_ARCHIVE_AFTER_DAYS. If neither is given, only
+            trashed Achievements are archived.
+    """
+    if days is None:
+        days = getattr(settings, 'ACHIEVEMENTS_ARCHIVE_AFTER_DAYS', None)
+
+    count = _archive_queryset(Achievement.objects.filter(trash=True), 'trashed')
+    if days is not None:
+        limit = datetime.now() - timedelta(days=days)
+        count += _archive_queryset(Achievement.objects.filter(timestamp__lt=limit), 'expired')
+    return count
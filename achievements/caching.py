@@ -0,0 +1,210 @@
+"""
+Everything this module caches is invalidated through here. Instead of deleting cache entries (which would mean
+knowing every key that was ever set), every key contains a generation counter. Invalidating simply increments the
+counter, so all old entries are never read again and expire on their own. There are three kinds of counters:
+one global, one per User and one per Prototype. A key can depend on the global counter only, or additionally on
+the counter of a User and/or a Prototype, or of a scope of its own.
+The signal handlers at the bottom of this file take care of invalidating whenever an Achievement or a Prototype
+is saved or deleted, no matter if that happens in a view, a MassForm or through a cascade from a treeio Object.
+Signals are sent before a transaction is committed, so between the invalidation and the commit another process
+can still read the old state and cache it under the new generation. Functions writing in a transaction therefore
+use commit_and_invalidate, which invalidates everything once more after the commit, and runs what has been
+postponed with after_commit.
+"""
+import time
+from threading import local
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from achievements.models import Prototype, Achievement
+from achievements.routers import on_primary
+
+KEY_PREFIX = 'achievements'
+# counters should live as long as possible, 30 days is the maximum memcached accepts
+GENERATION_TIMEOUT = 60 * 60 * 24 * 30
+
+# the scopes invalidated and the functions postponed during the current commit_and_invalidate, None outside of one
+_state = local()
+
+
+def _generation_key(scope):
+    """
+    The cache key of a generation counter.
+
+    Arguments:
+    scope -- 'global', 'user:<id>' or 'prototype:<id>'
+    """
+    return '%s:generation:%s' % (KEY_PREFIX, scope)
+
+
+def _new_generation():
+    """
+    The first value of a counter. Since counters can be evicted from the cache, they must never start at the
+    same value twice, or old entries would become valid again.
+    """
+    return int(time.time() * 1000)
+
+
+def _get_scopes(user=None, prototype=None, scope=None):
+    """ The list of scopes a key depends on. User and Prototype can be objects or ids. """
+    scopes = ['global']
+    if user is not None:
+        scopes.append('user:%s' % getattr(user, 'pk', user))
+    if prototype is not None:
+        scopes.append('prototype:%s' % getattr(prototype, 'pk', prototype))
+    if scope is not None:
+        scopes.append(scope)
+    return scopes
+
+
+def make_key(name, user=None, prototype=None, scope=None):
+    """
+    Build a cache key which becomes invalid as soon as anything it depends on is invalidated. All counters
+    are fetched in one round-trip.
+
+    Arguments:
+    name -- what is cached, unique within the module
+    user -- the User (or its id) the entry depends on, if any
+    prototype -- the Prototype (or its id) the entry depends on, if any
+    scope -- the name of another scope the entry depends on, if any
+    """
+    scopes = _get_scopes(user, prototype, scope)
+    keys = [_generation_key(scope) for scope in scopes]
+    generations = cache.get_many(keys)
+    parts = [KEY_PREFIX, name]
+    for scope, key in zip(scopes, keys):
+        generation = generations.get(key)
+        if generation is None:
+            generation = _new_generation()
+            # someone else might have been faster
+            if not cache.add(key, generation, GENERATION_TIMEOUT):
+                generation = cache.get(key, generation)
+        parts.append('%s-%s' % (scope, generation))
+    return ':'.join(parts)
+
+
+def invalidate(user=None, prototype=None, everything=False, scope=None):
+    """
+    Invalidate all entries depending on the given User, Prototype and/or scope, or simply everything.
+
+    Arguments:
+    user -- the User (or its id) whose entries are invalid
+    prototype -- the Prototype (or its id) whose entries are invalid
+    everything -- invalidate all entries of this module
+    scope -- the name of another scope whose entries are invalid
+    """
+    scopes = _get_scopes(user, prototype, scope)
+    if not everything:
+        scopes.remove('global')
+    _increment(scopes)
+    pending = getattr(_state, 'scopes', None)
+    if pending is not None:
+        pending.update(scopes)
+
+
+def _increment(scopes):
+    """ Increment the counters of a list of scopes. """
+    for scope in scopes:
+        key = _generation_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # the counter doesn't exist (anymore), so nothing can depend on it yet
+            cache.set(key, _new_generation(), GENERATION_TIMEOUT)
+
+
+def after_commit(f, *args):
+    """
+    Call a function once the current commit_and_invalidate has committed, or right away outside of one. If the
+    transaction is rolled back, the function isn't called at all.
+
+    Arguments:
+    f -- the function
+    *args -- arguments to be passed on
+    """
+    callbacks = getattr(_state, 'callbacks', None)
+    if callbacks is None:
+        f(*args)
+    else:
+        callbacks.append((f, args))
+
+
+def commit_and_invalidate(f):
+    """
+    This decorator works like transaction.commit_on_success, and afterwards invalidates everything that was
+    invalidated inside of the transaction once more. Entries cached between the first invalidation and the
+    commit might contain the old state, the second invalidation makes sure they are never read. Functions
+    postponed with after_commit are called after that, if the transaction was committed.
+
+    Arguments:
+    f -- the function that is decorated
+    """
+    committed = transaction.commit_on_success(f)
+
+    def wrap(*args, **kwargs):
+        """
+        Arguments:
+        *args -- arguments to be passed on
+        **kwargs -- keyword arguments to be passed on
+        """
+        if getattr(_state, 'scopes', None) is not None:
+            # the outermost call invalidates once everything is committed
+            return committed(*args, **kwargs)
+        _state.scopes = set()
+        _state.callbacks = []
+        committed_ok = False
+        try:
+            result = committed(*args, **kwargs)
+            committed_ok = True
+            return result
+        finally:
+            scopes, callbacks = _state.scopes, _state.callbacks
+            _state.scopes = _state.callbacks = None
+            # after a rollback this is not necessary, but does no harm
+            _increment(scopes)
+            if committed_ok:
+                for callback, arguments in callbacks:
+                    callback(*arguments)
+
+    wrap.__doc__ = f.__doc__
+    wrap.__name__ = f.__name__
+    return wrap
+
+
+def get_or_set(name, generator, user=None, prototype=None, timeout=None):
+    """
+    Get an entry from the cache, or generate and cache it if it isn't there (or not valid anymore). The value is
+    always generated from the primary database, since a lagging replica would put outdated data under the new
+    generation, where it would stay until the next invalidation.
+
+    Arguments:
+    name -- what is cached, unique within the module
+    generator -- a callable generating the value
+    user -- the User (or its id) the entry depends on, if any
+    prototype -- the Prototype (or its id) the entry depends on, if any
+    timeout -- seconds to keep the entry, defaults to the cache's default
+    """
+    key = make_key(name, user=user, prototype=prototype)
+    value = cache.get(key)
+    if value is None:
+        value = on_primary(generator)
+        cache.set(key, value, timeout)
+    return value
+
+
+def _invalidate_achievement(sender, instance, **kwargs):
+    """ Signal handler for saved and deleted Achievements. """
+    invalidate(user=instance.user_id, prototype=instance.prototype_id)
+
+
+def _invalidate_prototype(sender, instance, **kwargs):
+    """
+    Signal handler for saved and deleted Prototypes. Titles and icons of Prototypes show up everywhere, so
+    everything is invalidated.
+    """
+    invalidate(prototype=instance.pk, everything=True)
+
+post_save.connect(_invalidate_achievement, sender=Achievement, dispatch_uid='achievements_cache_achievement_save')
+post_delete.connect(_invalidate_achievement, sender=Achievement, dispatch_uid='achievements_cache_achievement_delete')
+post_save.connect(_invalidate_prototype, sender=Prototype, dispatch_uid='achievements_cache_prototype_save')
+post_delete.connect(_invalidate_prototype, sender=Prototype, dispatch_uid='achievements_cache_prototype_delete')
@@ -3,53 +3,103 @@ Since most of tree.io is based around forms, there are a few of them here. The M
 method which allows execution of whatever the user wanted by just running form.save()
 Maybe a bit odd is the unused 'user' argument, but this is default in tree.io and to be sure it's saver to keep it in.
 """
+import copy
 from django import forms
+from django.core.urlresolvers import reverse
+from django.utils.encoding import force_unicode
+from django.utils.safestring import mark_safe
 from django.utils.translation import ugettext as _
 from treeio.core.decorators import preprocess_form
+from treeio.core.models import User
 from achievements.models import Prototype, Achievement
+from achievements.caching import get_or_set
+from achievements.holders import get_holders
+from achievements.archive import archive
 
 preprocess_form()
 
 
 def _get_achievement_choices():
-    """ Make a list of tuples with all available Achievements, so they can be used for ChoiceFields. """
-    prts = Prototype.objects.filter(trash=False)
-    ret = [('-', '-')]
-    for prt in prts:
-        choice = (prt.pk, prt.title)
-        ret.append(choice)
-    return ret
+    """
+    Make a list of tuples with all available Achievements, so they can be used for ChoiceFields. The list is
+    cached until a Prototype changes.
+    """
+    def generate():
+        prts = Prototype.objects.filter(trash=False).values_list('pk', 'title')
+        ret = [('-', '-')]
+        for prt in prts:
+            ret.append(prt)
+        return ret
+    return get_or_set('achievement_choices', generate)
+
+
+class _LazyChoices(object):
+    """ An iterable of choices which is only generated the first time it is actually iterated. """
+
+    def __init__(self, generator):
+        """
+        Arguments:
+        generator -- a callable returning the choices
+        """
+        self.generator = generator
+        self._choices = None
+
+    def __iter__(self):
+        if self._choices is None:
+            self._choices = list(self.generator())
+        return iter(self._choices)
+
+    def __deepcopy__(self, memo):
+        """ Every copy (read: every form instance) generates its own choices again. """
+        return _LazyChoices(self.generator)
+
+
+class _LazyChoiceField(forms.ChoiceField):
+    """ A ChoiceField which doesn't evaluate its choices before they are needed for validation or rendering. """
+
+    def _set_choices(self, value):
+        # ChoiceField would call list() here, which is exactly what we want to avoid
+        self._choices = self.widget.choices = value
+
+    choices = property(forms.ChoiceField._get_choices, _set_choices)
+
+    def __deepcopy__(self, memo):
+        """ Make sure the field and its widget share the same choices, so they are only generated once. """
+        result = super(_LazyChoiceField, self).__deepcopy__(memo)
+        result.choices = copy.deepcopy(self._choices, memo)
+        return result
 
 
 class MassActionUserForm(forms.Form):
     """ Mass action form for Users in Achievements"""
 
-    award = forms.ChoiceField(label=_("Award selected"), choices=_get_achievement_choices(), required=False)
+    award = _LazyChoiceField(label=_("Award selected"), choices=_LazyChoices(_get_achievement_choices),
+                             required=False)
     instance = None
 
     def __init__(self, user, *args, **kwargs):
         """
-        If the kwargs argument instance is given, set it. Then run the init of forms.Form. Also, make sure the
-        fields are set.
+        If the kwargs argument instance is given, set it. Then run the init of forms.Form. The choices of the
+        award field are only fetched from the database once they are needed.
 
         Arguments:
         user -- the current user (get it via request.user)
         instance -- the object the form is related to
+        holders -- a dictionary of HolderSets by Prototype id, shared by all forms of one request so the holders
+                   are only fetched once
         *args -- arguments to be passed on
         **kwargs -- keyword arguments to be passed on
         """
         if 'instance' in kwargs:
             self.instance = kwargs['instance']
             del kwargs['instance']
+        self.holders = kwargs.pop('holders', {})
 
         super(MassActionUserForm, self).__init__(*args, **kwargs)
 
-        self.fields['award'] = forms.ChoiceField(label=_("Award selected"), choices=_get_achievement_choices(),
-                                                 required=False)
-
     def save(self, *args, **kwargs):
         """
-        Create a new Achievement object according to the form.
+        Create a new Achievement object according to the form, unless the user already holds the Achievement.
 
         Arguments:
         *args -- catch all arguments
@@ -59,8 +109,12 @@ class MassActionUserForm(forms.Form):
             if self.is_valid():
                 if self.cleaned_data['award'] and self.cleaned_data['award'] != '-':
                     p = Prototype.objects.get(pk=self.cleaned_data['award'])
-                    a = Achievement(prototype=p, user=self.instance)
-                    a.save()
+                    if p.pk not in self.holders:
+                        self.holders[p.pk] = get_holders(p)
+                    if self.instance.pk not in self.holders[p.pk]:
+                        a = Achievement(prototype=p, user=self.instance)
+                        a.save()
+                        self.holders[p.pk].add(self.instance.pk)
 
 
 class MassActionUserAchievementsForm(forms.Form):
@@ -92,7 +146,7 @@ class MassActionUserAchievementsForm(forms.Form):
 
     def save(self, *args, **kwargs):
         """
-        Delete the specified Achievement object,
+        Revoke the specified Achievement object, which moves it to the archive.
 
         Arguments:
         *args -- catch all arguments
@@ -101,7 +155,7 @@ class MassActionUserAchievementsForm(forms.Form):
         if self.instance:
             if self.is_valid():
                 if self.cleaned_data['revoke'] and self.cleaned_data['revoke'] != '-':
-                    self.instance.delete()
+                    archive(self.instance, 'revoked')
 
 
 class MassActionAchievementsForm(forms.Form):
@@ -170,7 +224,70 @@ class PrototypeForm(forms.ModelForm):
     class Meta:
         """ The model is Prototype and use all fields. """
         model = Prototype
-        fields = ('title', 'text', 'badge', 'icon')
+        fields = ('title', 'text', 'badge', 'icon', 'steps')
+
+
+class AutocompleteInput(forms.Widget):
+    """
+    Replaces the <select> of a ModelChoiceField, which would contain every single object, with a text input
+    that asks the server for matching objects while the user types (using jQuery UI). The id of the chosen
+    object is kept in a hidden input with the name of the field, so the field validates it as usual.
+    """
+
+    def __init__(self, url_name, get_label, attrs=None):
+        """
+        Arguments:
+        url_name -- name of the URL which answers the lookups, see views.search_autocomplete
+        get_label -- a callable returning the label of the object with the given id, None if it doesn't exist
+        attrs -- HTML-attributes of the text input
+        """
+        super(AutocompleteInput, self).__init__(attrs)
+        self.url_name = url_name
+        self.get_label = get_label
+
+    def render(self, name, value, attrs=None):
+        """ Render the hidden input, the text input showing the label and the script to connect them. """
+        attrs = self.build_attrs(attrs)
+        hidden_id = attrs.get('id', 'id_%s' % name)
+        attrs['id'] = '%s_autocomplete' % hidden_id
+
+        label = ''
+        if value:
+            label = self.get_label(value) or ''
+
+        hidden = forms.HiddenInput().render(name, value, {'id': hidden_id})
+        text = forms.TextInput().render('%s_autocomplete' % name, label, attrs)
+        script = u"""<script type="text/javascript">
+$(function() {
+    $('#%(text)s').autocomplete({
+        source: '%(url)s',
+        minLength: 1,
+        select: function(event, ui) { $('#%(hidden)s').val(ui.item.id); },
+        change: function(event, ui) { if (!ui.item) { $('#%(hidden)s').val(''); } }
+    });
+});
+</script>""" % {'text': attrs['id'], 'hidden': hidden_id, 'url': reverse(self.url_name)}
+        return mark_safe(u'%s%s%s' % (hidden, text, script))
+
+
+def _get_user_label(pk):
+    """ The label of a User for the AutocompleteInput. """
+    try:
+        user = list(User.objects.filter(pk=pk)[:1])
+    except (ValueError, TypeError):
+        # the hidden input was tampered with
+        return None
+    return force_unicode(user[0]) if user else None
+
+
+def _get_prototype_label(pk):
+    """ The label of a Prototype for the AutocompleteInput. """
+    try:
+        titles = list(Prototype.objects.filter(pk=pk).values_list('title', flat=True)[:1])
+    except (ValueError, TypeError):
+        # the hidden input was tampered with
+        return None
+    return titles[0] if titles else None
 
 
 class AchievementForm(forms.ModelForm):
@@ -178,7 +295,8 @@ class AchievementForm(forms.ModelForm):
 
     def __init__(self, user, *args, **kwargs):
         """
-        Run the init of forms.Form and add a TextArea-Widget to the Text-Field.
+        Run the init of forms.Form and add a TextArea-Widget to the Text-Field. User and Prototype get an
+        AutocompleteInput, so the page doesn't contain every User and Prototype there is.
 
         Arguments:
         user -- the current user (get it via request.user)
@@ -188,6 +306,10 @@ class AchievementForm(forms.ModelForm):
         """
         super(AchievementForm, self).__init__(*args, **kwargs)
         self.fields['text'].widget = forms.Textarea(attrs={})
+        self.fields['user'].widget = AutocompleteInput('achievements_user_autocomplete', _get_user_label)
+        self.fields['prototype'].queryset = Prototype.objects.filter(trash=False)
+        self.fields['prototype'].widget = AutocompleteInput('achievements_search_autocomplete',
+                                                            _get_prototype_label)
 
     class Meta:
         """ The model is Achievement and use all fields. """
@@ -0,0 +1,233 @@
+"""
+Answers questions like "who holds X", "who holds X and Y" or "who is missing X" without joining over the
+Achievement table every time. For every Prototype, the ids of the Users holding it are kept as the bits of a
+single integer (bit n is set if the User with id n holds it), which is small enough to be cached and makes
+intersections and differences a single operation.
+Achievements which have been archived because of their age are still held (see ArchivedAchievement.HELD_REASONS).
+The cached sets are built on first use and afterwards updated by the signal handlers at the bottom of this file
+whenever an Achievement is awarded, trashed or revoked, once that has been committed. Updates of the same set
+are serialized with a lock in the cache. If the lock can't be had, or there is nothing to update, the set is
+invalidated instead (it has a generation of its own, see caching.py), so a concurrent change is never lost.
+"""
+import binascii
+import time
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Q
+from django.db.models.signals import post_save, post_delete
+from achievements.models import Achievement, ArchivedAchievement
+from achievements.caching import make_key, invalidate, after_commit
+
+# above this many ids, filter_users lets the database do the filtering instead of sending the ids
+MAX_ID_LIST = 500
+# how long an update may hold the lock of a set, and how often it tries to get it (10ms apart)
+LOCK_TIMEOUT = 10
+LOCK_TRIES = 10
+
+
+class HolderSet(object):
+    """ A set of User ids, stored as a bitmap. """
+
+    def __init__(self, bits=0):
+        """
+        Arguments:
+        bits -- the bitmap, bit n is set if n is in the set
+        """
+        self.bits = bits
+
+    @classmethod
+    def from_ids(cls, ids):
+        """
+        Build a set from an iterable of User ids.
+
+        Arguments:
+        ids -- the User ids
+        """
+        ids = list(ids)
+        if not ids:
+            return cls()
+        # shifting and OR-ing would create a new integer of the full size for every id
+        data = bytearray(max(ids) // 8 + 1)
+        for pk in ids:
+            data[pk >> 3] |= 1 << (pk & 7)
+        data.reverse()
+        return cls(int(binascii.hexlify(data), 16))
+
+    def add(self, pk):
+        self.bits |= 1 << pk
+
+    def discard(self, pk):
+        self.bits &= ~(1 << pk)
+
+    def __contains__(self, pk):
+        return bool(self.bits >> pk & 1)
+
+    def __len__(self):
+        return bin(self.bits).count('1')
+
+    def __nonzero__(self):
+        return self.bits != 0
+
+    __bool__ = __nonzero__
+
+    def __iter__(self):
+        """ Iterate over the ids, in ascending order. """
+        bits = self.bits
+        while bits:
+            # only the lowest set bit
+            low = bits & -bits
+            yield low.bit_length() - 1
+            bits ^= low
+
+    def __and__(self, other):
+        return HolderSet(self.bits & other.bits)
+
+    def __or__(self, other):
+        return HolderSet(self.bits | other.bits)
+
+    def __sub__(self, other):
+        return HolderSet(self.bits & ~other.bits)
+
+    def __eq__(self, other):
+        return isinstance(other, HolderSet) and self.bits == other.bits
+
+    def __ne__(self, other):
+        return not self == other
+
+
+def _get_scope(prototype_id):
+    """ The scope of the cached HolderSet of a Prototype, see caching.py. """
+    return 'holders:%s' % prototype_id
+
+
+def _get_key(prototype_id):
+    """ The cache key of the HolderSet of a Prototype. """
+    return make_key('holders', scope=_get_scope(prototype_id))
+
+
+def get_holders(prototype):
+    """
+    Get the HolderSet of all Users holding a Prototype.
+
+    Arguments:
+    prototype -- the Prototype or its id
+    """
+    prototype_id = getattr(prototype, 'pk', prototype)
+    key = _get_key(prototype_id)
+    bits = cache.get(key)
+    if bits is None:
+        # built from the primary database, a replica might not have the latest awards yet
+        achievements, archived = _get_holder_queries(DEFAULT_DB_ALIAS, prototype_id)
+        ids = list(achievements.values_list('user', flat=True)) + list(archived.values_list('user', flat=True))
+        bits = HolderSet.from_ids(ids).bits
+        # an update since the key was built has either changed the cached set (which must not be overwritten)
+        # or invalidated the key
+        cache.add(key, bits)
+    return HolderSet(bits)
+
+
+def filter_users(queryset, has=(), missing=()):
+    """
+    Filter a QuerySet of Users by the Prototypes they hold.
+
+    Arguments:
+    queryset -- a QuerySet of User objects
+    has -- Prototypes (or their ids) the Users must all hold
+    missing -- Prototypes (or their ids) the Users must not hold
+    """
+    excluded = HolderSet()
+    for prototype in missing:
+        excluded |= get_holders(prototype)
+
+    if has:
+        selected = None
+        for prototype in has:
+            holders = get_holders(prototype)
+            selected = holders if selected is None else selected & holders
+        selected -= excluded
+        if len(selected) <= MAX_ID_LIST:
+            return queryset.filter(pk__in=list(selected))
+    elif len(excluded) <= MAX_ID_LIST:
+        return queryset.exclude(pk__in=list(excluded))
+
+    # too many ids for a single query, use subqueries instead
+    for prototype in has:
+        queryset = queryset.filter(_get_holder_filter(queryset.db, prototype))
+    for prototype in missing:
+        queryset = queryset.exclude(_get_holder_filter(queryset.db, prototype))
+    return queryset
+
+
+def _get_holder_queries(db, prototype):
+    """
+    The Achievements and the ArchivedAchievements through which Users hold a Prototype.
+
+    Arguments:
+    db -- the alias of the database to read from
+    prototype -- the Prototype or its id
+    """
+    prototype_id = getattr(prototype, 'pk', prototype)
+    achievements = Achievement.objects.using(db).filter(prototype=prototype_id, trash=False)
+    archived = ArchivedAchievement.objects.using(db).filter(prototype=prototype_id,
+                                                            reason__in=ArchivedAchievement.HELD_REASONS)
+    return achievements, archived
+
+
+def _get_holder_filter(db, prototype):
+    """
+    A Q object matching all Users holding a Prototype, using subqueries.
+
+    Arguments:
+    db -- the alias of the database the outer query runs on
+    prototype -- the Prototype or its id
+    """
+    achievements, archived = _get_holder_queries(db, prototype)
+    return Q(pk__in=achievements.values('user')) | Q(pk__in=archived.values('user'))
+
+
+def _holds(prototype_id, user_id):
+    """ Ask the primary database if a User holds a Prototype. """
+    achievements, archived = _get_holder_queries(DEFAULT_DB_ALIAS, prototype_id)
+    return achievements.filter(user=user_id).exists() or archived.filter(user=user_id).exists()
+
+
+def _update_cached(prototype_id, user_id):
+    """
+    Add a User to or remove it from the cached HolderSet of a Prototype, depending on what the database says.
+
+    Arguments:
+    prototype_id -- the id of the Prototype
+    user_id -- the id of the User
+    """
+    lock = 'achievements:holders-lock:%s' % prototype_id
+    for i in range(LOCK_TRIES):
+        if cache.add(lock, 1, LOCK_TIMEOUT):
+            break
+        time.sleep(0.01)
+    else:
+        invalidate(scope=_get_scope(prototype_id))
+        return
+
+    try:
+        key = _get_key(prototype_id)
+        bits = cache.get(key)
+        if bits is None:
+            # a set that is being built right now might be missing the change
+            invalidate(scope=_get_scope(prototype_id))
+            return
+        holders = HolderSet(bits)
+        if _holds(prototype_id, user_id):
+            holders.add(user_id)
+        else:
+            holders.discard(user_id)
+        cache.set(key, holders.bits)
+    finally:
+        cache.delete(lock)
+
+
+def _update_holders(sender, instance, **kwargs):
+    """ Signal handler for saved and deleted Achievements. The cached HolderSet is updated after the commit. """
+    after_commit(_update_cached, instance.prototype_id, instance.user_id)
+
+post_save.connect(_update_holders, sender=Achievement, dispatch_uid='achievements_holders_save')
+post_delete.connect(_update_holders, sender=Achievement, dispatch_uid='achievements_holders_delete')
@@ -0,0 +1,19 @@
+"""
+Archives trashed and old Achievements, see archive.py. Meant to be run regularly, e.g. by cron.
+"""
+from optparse import make_option
+from django.core.management.base import NoArgsCommand
+from achievements.archive import archive_old
+
+
+class Command(NoArgsCommand):
+    """ Move trashed Achievements and those older than --days into the archive. """
+    help = 'Archive trashed and old Achievements.'
+    option_list = NoArgsCommand.option_list + (
+        make_option('--days', type='int', dest='days', default=None,
+                    help='Archive Achievements older than this. Defaults to ACHIEVEMENTS_ARCHIVE_AFTER_DAYS.'),
+    )
+
+    def handle_noargs(self, **options):
+        count = archive_old(days=options['days'])
+        self.stdout.write('Archived %d Achievements.\n' % count)
@@ -0,0 +1,93 @@
+"""
+Compares how long the list templatetags take to render with tree.io's usual rendering (a new RequestContext per
+call, and the admin check repeated for every row) and with the compiled templates they use now. Needs some
+Users, Prototypes and Achievements in the database, and renders for the first User.
+"""
+import time
+from optparse import make_option
+from django.conf import settings
+from django.core.management.base import NoArgsCommand, CommandError
+from django.test.client import RequestFactory
+from django.utils.importlib import import_module
+from treeio.core.models import User
+from achievements.models import Prototype, Achievement
+from achievements.templatetags.achievements import render_with_request_context, _render, _is_admin
+
+
+class _AdminCheckPerRow(object):
+    """
+    Stands in for is_admin on the old path. The templates used to call
+    user.get_profile().is_admin(module_name='achievements') in every row, so this does the same every time the
+    template tests it.
+    """
+
+    def __init__(self, user):
+        """
+        Arguments:
+        user -- the Django User the page is rendered for
+        """
+        self.user = user
+
+    def __nonzero__(self):
+        return bool(self.user.get_profile().is_admin(module_name='achievements'))
+
+    __bool__ = __nonzero__
+
+
+class Command(NoArgsCommand):
+    """ Render every list templatetag with both methods and print the time per 100 rows. """
+    help = 'Benchmark the rendering of the achievements templatetags.'
+    option_list = NoArgsCommand.option_list + (
+        make_option('--rows', type='int', dest='rows', default=100, help='Number of rows per list.'),
+        make_option('--runs', type='int', dest='runs', default=10, help='How often every list is rendered.'),
+    )
+
+    def handle_noargs(self, **options):
+        rows = options['rows']
+        runs = options['runs']
+
+        profiles = list(User.objects.all()[:rows])
+        if not profiles:
+            raise CommandError('There are no users to render.')
+
+        request = RequestFactory().get('/achievements/')
+        request.user = profiles[0].user
+        request.session = import_module(settings.SESSION_ENGINE).SessionStore()
+        context = {'request': request, 'user': request.user, 'response_format': 'html'}
+
+        achievements = list(Achievement.objects.select_related('prototype')[:rows])
+        lists = [
+            ('achievements/tags/user_list', 'users', profiles),
+            ('achievements/tags/achievements_list', 'achievements', achievements),
+            ('achievements/tags/prototypes_list', 'prototypes', list(Prototype.objects.all()[:rows])),
+            ('achievements/tags/icon_line', 'achievements', achievements[:25]),
+        ]
+
+        self.stdout.write('%-40s %12s %12s\n' % ('template', 'before [ms]', 'after [ms]'))
+        for name, key, items in lists:
+            data = {key: items, 'skip_group': False}
+            # icon_line is rendered once per row of a list, the lists themselves once per page
+            if name.endswith('icon_line'):
+                calls, count = rows, rows
+            else:
+                calls, count = 1, len(items)
+            if not count:
+                continue
+
+            # the old path: a RequestContext per call and the admin check per row
+            before = self._measure(lambda: render_with_request_context(
+                name, dict(data, is_admin=_AdminCheckPerRow(request.user)), request, 'html'), runs, calls)
+            # the new path: the page's context and the admin check once per list, as the tags do it
+            after = self._measure(lambda: _render(context, name, dict(data, is_admin=_is_admin(context))),
+                                  runs, calls)
+            scale = 100.0 / count
+            self.stdout.write('%-40s %12.2f %12.2f\n' % (name, before * scale, after * scale))
+
+    def _measure(self, render, runs, calls):
+        """ Average time in milliseconds of 'calls' renderings, after one warm-up call. """
+        render()
+        start = time.time()
+        for i in range(runs):
+            for j in range(calls):
+                render()
+        return (time.time() - start) * 1000 / runs
@@ -0,0 +1,34 @@
+"""
+The worker which sends the digests of new Achievements, see notifications.py. Run it next to the web server,
+e.g. with supervisord, or from cron with --once.
+"""
+import time
+from optparse import make_option
+from django.core.management.base import NoArgsCommand
+from achievements.notifications import send_digests, NOTIFY_INTERVAL
+
+
+class Command(NoArgsCommand):
+    """ Send the pending digests every --interval seconds. """
+    help = 'Send the digests of newly awarded Achievements.'
+    option_list = NoArgsCommand.option_list + (
+        make_option('--interval', type='int', dest='interval', default=NOTIFY_INTERVAL,
+                    help='Seconds between two digests. Defaults to ACHIEVEMENTS_NOTIFY_INTERVAL.'),
+        make_option('--once', action='store_true', dest='once', default=False,
+                    help='Send the pending digests and exit.'),
+    )
+
+    def handle_noargs(self, **options):
+        while True:
+            try:
+                count = send_digests()
+                if count:
+                    self.stdout.write('Sent %d digests.\n' % count)
+            except Exception as e:
+                if options['once']:
+                    raise
+                # try again with the next run
+                self.stderr.write('Sending digests failed: %s\n' % e)
+            if options['once']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,20 @@
+"""
+Rebuilds the search index of the module from scratch. Only needed once for data which existed before the
+search was added, afterwards the index updates itself.
+"""
+from django.core.management.base import NoArgsCommand
+from achievements.models import Prototype, Achievement, SearchTerm
+from achievements.search import index_prototype, index_achievement
+
+
+class Command(NoArgsCommand):
+    """ Empty the index and index all Prototypes and Achievements again. """
+    help = 'Rebuild the search index of the achievements module.'
+
+    def handle_noargs(self, **options):
+        SearchTerm.objects.all().delete()
+        for prototype in Prototype.objects.filter(trash=False):
+            index_prototype(prototype)
+        for achievement in Achievement.objects.filter(trash=False):
+            index_achievement(achievement)
+        self.stdout.write('Indexed %d terms.\n' % SearchTerm.objects.count())
@@ -15,6 +15,8 @@ class Prototype(Object):
     text = models.CharField(max_length=512)
     badge = models.ImageField(upload_to='achievements-badges', blank=True)
     icon = models.ImageField(upload_to='achievements-icons', blank=True)
+    steps = models.CharField(max_length=255, blank=True, default='',
+                             help_text='For progress badges, e.g. "10, 50, 100". Awarded when the last is reached.')
 
     class Meta:
         ordering = ['title']
@@ -33,6 +35,11 @@ class Prototype(Object):
         """ A tree.io templatetag can sort lists alphabetically by the name attribute. """
         return self.title
 
+    @property
+    def step_list(self):
+        """ The steps of a progress badge as a sorted list of numbers. Empty for normal badges. """
+        return sorted(int(step) for step in self.steps.replace(' ', '').split(',') if step.isdigit())
+
 
 class Achievement(Object):
     """ A entity used to give an Achievement to a user. """
@@ -52,3 +59,107 @@ class Achievement(Object):
     def name(self):
         """ A tree.io templatetag can sort lists alphabetically by the name attribute. """
         return self.prototype.title
+
+
+class ArchivedAchievement(models.Model):
+    """
+    An Achievement that has been revoked, trashed or is simply old. Unlike Achievement, it doesn't inherit from
+    Object, so archiving an Achievement also gets rid of its row in the (huge) table of Object. See archive.py.
+    Expired Achievements were only archived because of their age, so the User still holds them.
+    """
+    REASONS = (
+        ('revoked', 'Revoked'),
+        ('trashed', 'Trashed'),
+        ('expired', 'Expired'),
+    )
+    # archived for these reasons, the User still holds the Achievement
+    HELD_REASONS = ('expired',)
+
+    prototype = models.ForeignKey(Prototype, related_name='archived_achievements')
+    user = models.ForeignKey(User, related_name='archived_achievements')
+    text = models.CharField(max_length=512, default='')
+    timestamp = models.DateTimeField()
+    archived = models.DateTimeField(auto_now_add=True)
+    reason = models.CharField(max_length=16, choices=REASONS)
+
+    class Meta:
+        ordering = ['-timestamp']
+
+    def __unicode__(self):
+        """ Same as Achievement, but mark it as archived. """
+        return '%s [%s, archived]' % (self.prototype.title, self.user.get_username())
+
+    @property
+    def name(self):
+        """ A tree.io templatetag can sort lists alphabetically by the name attribute. """
+        return self.prototype.title
+
+
+class Progress(models.Model):
+    """
+    How far a User has come towards a progress badge (see Prototype.steps). The value is only ever changed
+    through progress.increment(), which collects increments and writes them in batches.
+    """
+    user = models.ForeignKey(User, related_name='achievement_progress')
+    prototype = models.ForeignKey(Prototype, related_name='progress')
+    value = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('user', 'prototype')
+
+    def __unicode__(self):
+        return '%s [%s: %d]' % (self.prototype.title, self.user.get_username(), self.value)
+
+    @property
+    def next_step(self):
+        """ The first step which hasn't been reached yet, or the last one if all of them have. """
+        steps = self.prototype.step_list
+        for step in steps:
+            if step > self.value:
+                return step
+        return steps[-1] if steps else 0
+
+    @property
+    def percent(self):
+        """ How far it is to the next step, in percent. """
+        step = self.next_step
+        if not step:
+            return 100
+        return min(100, 100 * self.value // step)
+
+
+class AwardNotification(models.Model):
+    """
+    An award the User hasn't been told about yet. They are collected and sent as one digest per User by the
+    achievements_notify command, see notifications.py.
+    """
+    user = models.ForeignKey(User, related_name='achievement_notifications')
+    achievement = models.ForeignKey(Achievement, related_name='notifications')
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['created']
+
+    def __unicode__(self):
+        return unicode(self.achievement)
+
+
+class SearchTerm(models.Model):
+    """
+    One entry of the inverted index used for searching Prototypes and Achievements. There is one row per
+    (word, object), which is all that is needed for prefix matching on an indexed column. See search.py.
+    """
+    term = models.CharField(max_length=64, db_index=True)
+    prototype = models.ForeignKey(Prototype, null=True, blank=True, related_name='search_terms')
+    achievement = models.ForeignKey(Achievement, null=True, blank=True, related_name='search_terms')
+
+    def __unicode__(self):
+        return self.term
+
+
+# the search index and the cache keep themselves up to date through signals, which are connected in there
+import achievements.search
+import achievements.caching
+import achievements.holders
+import achievements.progress
+import achievements.notifications
@@ -0,0 +1,98 @@
+"""
+Tells Users about their new Achievements without slowing down the request that awarded them. Awarding only
+stores an AwardNotification (one cheap INSERT, even for a mass award to a thousand users). The
+achievements_notify command runs next to the web server and every ACHIEVEMENTS_NOTIFY_INTERVAL seconds sends
+one e-mail per User, listing everything that User has been awarded since the last one.
+Every digest is sent in a transaction of its own: the notifications of the User are locked and deleted, the
+e-mail is sent, and the transaction is committed. If sending fails, only that digest is rolled back and sent
+with the next run, and two workers never send the same notification. Delivery is at-least-once: if the commit
+itself fails after the e-mail went out, that one digest is sent again.
+"""
+from django.conf import settings
+from django.core.mail import send_mass_mail, get_connection
+from django.db import transaction
+from django.db.models.signals import post_save
+from achievements.models import Achievement, AwardNotification
+
+# seconds between two digests
+NOTIFY_INTERVAL = getattr(settings, 'ACHIEVEMENTS_NOTIFY_INTERVAL', 300)
+# how many Users get a digest per run, the rest waits for the next one
+BATCH_SIZE = 5000
+# how many notifications one digest lists at most, the rest is sent with the next one
+CHUNK_SIZE = 500
+
+
+def _build_message(user, achievements):
+    """
+    Build the (subject, message, from, recipients) tuple of one digest.
+
+    Arguments:
+    user -- the recipient, a treeio User
+    achievements -- a list of Achievement objects
+    """
+    if len(achievements) == 1:
+        subject = 'You have been awarded %s' % achievements[0].prototype.title
+    else:
+        subject = 'You have been awarded %d Achievements' % len(achievements)
+    lines = ['Congratulations %s, you have been awarded:' % user.get_username(), '']
+    for achievement in achievements:
+        lines.append(' * %s' % achievement.prototype.title)
+        if achievement.text:
+            lines.append('   %s' % achievement.text)
+    return subject, '\n'.join(lines), settings.DEFAULT_FROM_EMAIL, [user.user.email]
+
+
+def send_digests():
+    """
+    Send one e-mail per User for all pending notifications, and delete them. Returns the number of e-mails.
+    """
+    user_ids = list(AwardNotification.objects.order_by('user').values_list('user', flat=True).distinct()
+                    [:BATCH_SIZE])
+    if not user_ids:
+        return 0
+
+    # all digests of a run share one connection to the mail server
+    connection = get_connection()
+    connection.open()
+    try:
+        return len([user_id for user_id in user_ids if _send_digest(user_id, connection)])
+    finally:
+        connection.close()
+
+
+@transaction.commit_on_success
+def _send_digest(user_id, connection):
+    """
+    Claim the pending notifications of one User and send them. The notifications are only gone once the
+    e-mail has been sent. Returns True if an e-mail was sent.
+
+    Arguments:
+    user_id -- the id of the User
+    connection -- the connection to the mail server
+    """
+    # only the notifications are locked, not the Users and Achievements they are joined with
+    ids = list(AwardNotification.objects.select_for_update().filter(user=user_id)
+               .values_list('pk', flat=True)[:CHUNK_SIZE])
+    if not ids:
+        # another worker was faster
+        return False
+    notifications = list(AwardNotification.objects.filter(pk__in=ids)
+                         .select_related('user__user', 'achievement__prototype'))
+    AwardNotification.objects.filter(pk__in=ids).delete()
+
+    user = notifications[0].user
+    # users without an e-mail address can't be notified, their notifications are dropped all the same
+    if not user.user.email:
+        return False
+    # if sending fails, the deletion is rolled back and the digest is sent with the next run
+    send_mass_mail([_build_message(user, [notification.achievement for notification in notifications])],
+                   connection=connection)
+    return True
+
+
+def _queue_notification(sender, instance, created, **kwargs):
+    """ Signal handler for saved Achievements, queues a notification for new ones. """
+    if created:
+        AwardNotification.objects.create(user_id=instance.user_id, achievement=instance)
+
+post_save.connect(_queue_notification, sender=Achievement, dispatch_uid='achievements_queue_notification')
@@ -0,0 +1,197 @@
+"""
+Progress towards multi-step badges ("10/50/100 reports"). Other modules call increment() whenever something
+counts towards a badge. Increments are only collected in memory and written to the database by flush(), which
+happens once FLUSH_INTERVAL seconds have passed or MAX_PENDING counters are waiting. That way, a hundred events
+for the same User and Prototype turn into a single UPDATE. A background thread flushes every FLUSH_INTERVAL
+seconds, pending increments are also flushed at the end of a request if they are due, and when the process exits
+normally. A process that is killed (SIGKILL, or SIGTERM without a handler that exits cleanly) loses what has been
+counted since the last flush, so at most FLUSH_INTERVAL seconds of increments.
+Increments for Users or Prototypes which don't exist (anymore) are dropped, and every (User, Prototype) is
+written in a savepoint of its own, so one bad counter can't hold up the others. If a flush fails as a whole,
+nothing of it is written and the increments are kept for the next one. Neither increment() nor the automatic
+flushes ever raise, failures are logged.
+When the last step of a Prototype is reached, the User is awarded the Achievement.
+"""
+import atexit
+import logging
+import threading
+import time
+from django.conf import settings
+from django.core.signals import request_finished
+from django.db import connection, transaction, IntegrityError
+from django.db.models import F
+from treeio.core.models import User
+from achievements.models import Prototype, Achievement, Progress
+from achievements.caching import commit_and_invalidate
+from achievements.holders import get_holders
+from achievements.routers import on_primary
+
+# seconds between two flushes
+FLUSH_INTERVAL = getattr(settings, 'ACHIEVEMENTS_PROGRESS_FLUSH_INTERVAL', 10)
+# how many different (User, Prototype) counters may wait before they are flushed anyway
+MAX_PENDING = getattr(settings, 'ACHIEVEMENTS_PROGRESS_MAX_PENDING', 1000)
+
+_lock = threading.Lock()
+# (user id, prototype id) -> amount not written yet
+_pending = {}
+_last_flush = [time.time()]
+# the thread flushing every FLUSH_INTERVAL seconds, started with the first increment
+_thread = []
+
+logger = logging.getLogger(__name__)
+
+
+def increment(user, prototype, amount=1):
+    """
+    Count something towards a progress badge. The database is only updated with the next flush. Never raises,
+    so counting can't break the code that counts.
+
+    Arguments:
+    user -- the User (or its id)
+    prototype -- the Prototype (or its id)
+    amount -- how much to add
+    """
+    key = (getattr(user, 'pk', user), getattr(prototype, 'pk', prototype))
+    _lock.acquire()
+    try:
+        _pending[key] = _pending.get(key, 0) + amount
+        if not _thread:
+            _start_thread()
+    finally:
+        _lock.release()
+    if _is_due():
+        _flush_quietly()
+
+
+def _is_due():
+    """ True if the pending increments should be written. """
+    return len(_pending) >= MAX_PENDING or time.time() - _last_flush[0] >= FLUSH_INTERVAL
+
+
+def flush():
+    """
+    Write all pending increments, one UPDATE per (User, Prototype), and award reached badges. Everything is
+    written in one transaction, if it fails, the increments are pending again and the exception is raised.
+    """
+    _lock.acquire()
+    try:
+        pending = _pending.copy()
+        _pending.clear()
+        _last_flush[0] = time.time()
+    finally:
+        _lock.release()
+    if not pending:
+        return
+
+    try:
+        # everything that is read here decides what is written, so nothing may come from a lagging replica
+        on_primary(_write, pending)
+    except Exception:
+        _restore(pending)
+        raise
+
+
+def _flush_quietly():
+    """ Flush, but only log a failure. The increments are kept for the next try in that case. """
+    try:
+        flush()
+    except Exception:
+        logger.exception('Flushing the progress failed')
+
+
+@commit_and_invalidate
+def _write(pending):
+    """
+    Write a dictionary of increments, see flush(). Increments for Users and Prototypes which don't exist are
+    dropped, the others are written one savepoint each.
+    """
+    valid = {}
+    for (user_id, prototype_id), amount in pending.items():
+        try:
+            key = (int(user_id), int(prototype_id))
+        except (TypeError, ValueError):
+            # ids which aren't numbers can't exist
+            continue
+        valid[key] = valid.get(key, 0) + amount
+    pending = valid
+    prototypes = Prototype.objects.in_bulk(set(prototype_id for user_id, prototype_id in pending))
+    user_ids = set(User.objects.filter(pk__in=set(user_id for user_id, prototype_id in pending))
+                   .values_list('pk', flat=True))
+
+    for (user_id, prototype_id), amount in pending.items():
+        if user_id not in user_ids or prototype_id not in prototypes:
+            continue
+        sid = transaction.savepoint()
+        try:
+            _add(user_id, prototype_id, amount)
+            _award_if_reached(user_id, prototypes[prototype_id])
+            transaction.savepoint_commit(sid)
+        except Exception:
+            transaction.savepoint_rollback(sid)
+            logger.exception('Writing the progress of User %s for Prototype %s failed', user_id, prototype_id)
+
+
+def _restore(pending):
+    """ Add increments which couldn't be written back to the pending ones. """
+    _lock.acquire()
+    try:
+        for key, amount in pending.items():
+            _pending[key] = _pending.get(key, 0) + amount
+    finally:
+        _lock.release()
+
+
+def _add(user_id, prototype_id, amount):
+    """ Add to the value of one Progress, creating it if necessary. """
+    progress = Progress.objects.filter(user=user_id, prototype=prototype_id)
+    if progress.update(value=F('value') + amount):
+        return
+    sid = transaction.savepoint()
+    try:
+        Progress.objects.create(user_id=user_id, prototype_id=prototype_id, value=amount)
+        transaction.savepoint_commit(sid)
+    except IntegrityError:
+        # another process was faster
+        transaction.savepoint_rollback(sid)
+        progress.update(value=F('value') + amount)
+
+
+def _award_if_reached(user_id, prototype):
+    """ Award the Achievement if the last step of the Prototype has been reached and the User doesn't hold it. """
+    steps = prototype.step_list
+    if not steps or user_id in get_holders(prototype):
+        return
+    values = list(Progress.objects.filter(user=user_id, prototype=prototype).values_list('value', flat=True)[:1])
+    if values and values[0] >= steps[-1]:
+        Achievement(prototype=prototype, user_id=user_id).save()
+
+
+def _start_thread():
+    """ Start the thread which flushes every FLUSH_INTERVAL seconds. Must be called with the lock held. """
+    thread = threading.Thread(target=_flush_periodically, name='achievements-progress-flush')
+    # it must not keep the process alive, atexit takes care of the rest
+    thread.daemon = True
+    thread.start()
+    _thread.append(thread)
+
+
+def _flush_periodically():
+    """ Flush every FLUSH_INTERVAL seconds, for as long as the process lives. """
+    while True:
+        time.sleep(FLUSH_INTERVAL)
+        if not _pending:
+            continue
+        try:
+            _flush_quietly()
+        finally:
+            # don't keep a connection open for this thread between flushes
+            connection.close()
+
+
+def _flush_if_due(sender, **kwargs):
+    """ Signal handler for the end of a request. """
+    if _pending and _is_due():
+        _flush_quietly()
+
+request_finished.connect(_flush_if_due, dispatch_uid='achievements_progress_flush')
+atexit.register(lambda: _pending and _flush_quietly())
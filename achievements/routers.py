@@ -0,0 +1,161 @@
+"""
+Routing of database queries to read replicas. Read-only pages of this module can be served from replicas, while
+everything that writes, and every request shortly after a write of the same session (so people see what they
+just did), sticks to the primary database. Replicas are only ever used by views which opt in (see
+route_database), everything else, e.g. commands and workers, always uses the primary database.
+To use it, list the aliases of the replicas in the setting ACHIEVEMENTS_READ_DATABASES and add
+'achievements.routers.AchievementsRouter' to DATABASE_ROUTERS. Without the setting, everything stays on the
+default database.
+"""
+import random
+import time
+from threading import local
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# how long a session keeps reading from the primary after it has written something
+PIN_SECONDS = getattr(settings, 'ACHIEVEMENTS_PIN_SECONDS', 10)
+PIN_SESSION_KEY = 'achievements_pinned_until'
+
+_state = local()
+
+
+def get_read_databases():
+    """ The aliases of the replicas, as configured in ACHIEVEMENTS_READ_DATABASES. """
+    return getattr(settings, 'ACHIEVEMENTS_READ_DATABASES', ())
+
+
+def allow_replicas():
+    """
+    Let the following reads of the current thread go to a replica. One replica is chosen for all of them, so
+    they see the same state.
+    """
+    replicas = get_read_databases()
+    _state.replica = random.choice(replicas) if replicas else None
+
+
+def pin_to_primary():
+    """ Make all following reads of the current thread go to the primary database. This is the default. """
+    _state.replica = None
+
+
+def is_pinned():
+    """ True if the current thread has to read from the primary database. """
+    return getattr(_state, 'replica', None) is None
+
+
+def get_read_database():
+    """ The alias of the database the current thread should read from. """
+    return getattr(_state, 'replica', None) or DEFAULT_DB_ALIAS
+
+
+def on_primary(f, *args, **kwargs):
+    """
+    Call a function with all reads going to the primary database, e.g. to build something which is cached,
+    so that no outdated data from a replica ends up in the cache.
+
+    Arguments:
+    f -- the function
+    *args -- arguments to be passed on
+    **kwargs -- keyword arguments to be passed on
+    """
+    replica = getattr(_state, 'replica', None)
+    pin_to_primary()
+    try:
+        return f(*args, **kwargs)
+    finally:
+        _state.replica = replica
+
+
+def read(queryset):
+    """
+    Route a QuerySet to the database the current thread should read from. This also works without the
+    router installed.
+
+    Arguments:
+    queryset -- a QuerySet that is only read
+    """
+    return queryset.using(get_read_database())
+
+
+def pin_session(request):
+    """
+    Remember that this session has just written something, so it reads from the primary for a while. Requests
+    without a session (e.g. API clients authenticated by a key) only pin the current thread, there is nothing to
+    remember for them, and a new session would be created and saved for every request.
+
+    Arguments:
+    request -- a Django Request object
+    """
+    pin_to_primary()
+    if request.session.session_key is None:
+        return
+    request.session[PIN_SESSION_KEY] = time.time() + PIN_SECONDS
+
+
+def is_session_pinned(request):
+    """
+    True if the session has written something recently.
+
+    Arguments:
+    request -- a Django Request object
+    """
+    return request.session.get(PIN_SESSION_KEY, 0) > time.time()
+
+
+def route_database(f):
+    """
+    This decorator lets a view read from a replica. POST requests write, so they use the primary
+    database, and so does the same session for a few seconds afterwards, so users see their own changes even if
+    the replicas are lagging behind.
+
+    Arguments:
+    f -- the function that is decorated
+    """
+
+    def wrap(request, *args, **kwargs):
+        """
+        Allow replicas if possible, and make sure the thread is back on the primary database afterwards.
+
+        Arguments:
+        request -- the Django-request
+        *args -- catch args to pass them on afterwards
+        **kwargs -- catch kwargs to pass them on afterwards
+        """
+        if request.method == 'POST':
+            pin_session(request)
+        elif not is_session_pinned(request):
+            allow_replicas()
+        try:
+            return f(request, *args, **kwargs)
+        finally:
+            pin_to_primary()
+
+    wrap.__doc__ = f.__doc__
+    wrap.__name__ = f.__name__
+    return wrap
+
+
+class AchievementsRouter(object):
+    """ Sends reads of this module's models to a replica unless the current thread is pinned to the primary. """
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label == 'achievements':
+            return get_read_database()
+        return None
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label == 'achievements':
+            return DEFAULT_DB_ALIAS
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the same data as the primary
+        if obj1._meta.app_label == 'achievements' or obj2._meta.app_label == 'achievements':
+            return True
+        return None
+
+    def allow_syncdb(self, db, model):
+        if model._meta.app_label == 'achievements' and db in get_read_databases():
+            return False
+        return None
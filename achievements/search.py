@@ -0,0 +1,134 @@
+"""
+A small full-text search for Prototypes and Achievements. Instead of depending on the full-text engine of one
+specific database (tree.io runs on whatever Django supports), the words of every object are kept in an inverted
+index, the SearchTerm model. Since all terms are stored in lowercase, both exact and prefix matches are simple
+lookups on an indexed column, which works the same on SQLite, MySQL and PostgreSQL.
+The index is kept up to date by the signal handlers at the bottom of this file. To fill it for existing data,
+run the achievements_reindex command.
+"""
+import re
+from django.db.models.signals import post_save
+from django.utils.html import strip_tags
+from achievements.models import Prototype, Achievement, SearchTerm
+
+# the length of the term column
+MAX_TERM_LENGTH = 64
+# shorter words only match whole terms, a prefix of one or two letters matches almost everything
+MIN_PREFIX_LENGTH = 3
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(text):
+    """
+    Split a text into a list of unique, lowercase words. HTML-tags are removed first.
+
+    Arguments:
+    text -- the text to be split
+    """
+    words = []
+    for word in _WORD_RE.findall(strip_tags(text or '').lower()):
+        word = word[:MAX_TERM_LENGTH]
+        if word not in words:
+            words.append(word)
+    return words
+
+
+def index_prototype(prototype):
+    """
+    (Re-)index the title and text of a Prototype. Trashed Prototypes are removed from the index.
+
+    Arguments:
+    prototype -- the Prototype object
+    """
+    SearchTerm.objects.filter(prototype=prototype).delete()
+    if prototype.trash:
+        return
+    for term in tokenize('%s %s' % (prototype.title, prototype.text)):
+        SearchTerm.objects.create(term=term, prototype=prototype)
+
+
+def index_achievement(achievement):
+    """
+    (Re-)index the text of an Achievement. Trashed Achievements are removed from the index.
+
+    Arguments:
+    achievement -- the Achievement object
+    """
+    SearchTerm.objects.filter(achievement=achievement).delete()
+    if achievement.trash:
+        return
+    for term in tokenize(achievement.text):
+        SearchTerm.objects.create(term=term, achievement=achievement)
+
+
+def _filter_words(queryset, query, min_prefix_length):
+    """
+    Filter a QuerySet of Prototypes or Achievements down to the objects which contain every word of the query.
+    The last word only has to match the beginning of a term (if it is long enough), so half-typed queries
+    already return something. Every word becomes a join on the (indexed) term column, so the database does all
+    the work.
+
+    Arguments:
+    queryset -- a QuerySet of Prototype or Achievement objects
+    query -- the search string
+    min_prefix_length -- how long the last word must be to match as a prefix
+    """
+    words = tokenize(query)
+    if not words:
+        return queryset.none()
+
+    for word in words[:-1]:
+        queryset = queryset.filter(search_terms__term=word)
+    if len(words[-1]) < min_prefix_length:
+        return queryset.filter(search_terms__term=words[-1]).distinct()
+    return queryset.filter(search_terms__term__startswith=words[-1]).distinct()
+
+
+def search_prototypes(query, min_prefix_length=MIN_PREFIX_LENGTH):
+    """
+    Get a QuerySet of all Prototypes matching the query.
+
+    Arguments:
+    query -- the search string
+    min_prefix_length -- how long the last word must be to match as a prefix
+    """
+    return _filter_words(Prototype.objects.filter(trash=False), query, min_prefix_length)
+
+
+def search_achievements(query, min_prefix_length=MIN_PREFIX_LENGTH):
+    """
+    Get a QuerySet of all Achievements whose text matches the query.
+
+    Arguments:
+    query -- the search string
+    min_prefix_length -- how long the last word must be to match as a prefix
+    """
+    return _filter_words(Achievement.objects.filter(trash=False), query, min_prefix_length)
+
+
+def autocomplete_prototypes(prefix, limit=10):
+    """
+    Get a list of (id, title) tuples of Prototypes for which one of the words of their title or text starts
+    with the prefix. Only the first 'limit' Prototypes (sorted by title) are fetched, so even a single letter
+    is matched as a prefix.
+
+    Arguments:
+    prefix -- what the user has typed so far
+    limit -- the maximal number of results
+    """
+    return list(search_prototypes(prefix, min_prefix_length=1).values_list('pk', 'title')[:limit])
+
+
+def _update_prototype_index(sender, instance, **kwargs):
+    """ Signal handler to keep the index up to date when a Prototype is saved. """
+    index_prototype(instance)
+
+
+def _update_achievement_index(sender, instance, **kwargs):
+    """ Signal handler to keep the index up to date when an Achievement is saved. """
+    index_achievement(instance)
+
+# deleted objects don't need a handler, their terms are deleted along with them
+post_save.connect(_update_prototype_index, sender=Prototype, dispatch_uid='achievements_index_prototype')
+post_save.connect(_update_achievement_index, sender=Achievement, dispatch_uid='achievements_index_achievement')
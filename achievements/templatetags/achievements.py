@@ -2,25 +2,72 @@
 These templatetags are used to generate the characteristic lists of tree.io. I started out
 from the templatetag used in the Identities module. They are pretty simple and almost the same, only
 use a different template.
+Since they are called for every page (and icon_line even for every row of a list), HTML is rendered directly
+with the compiled Jinja template and a small context, taken from the page that is already being rendered,
+instead of running all context processors again. Other formats still go through tree.io's rendering.
+The templates are looked up by the same name tree.io's render_to_string uses, so themes and overrides still
+apply, and Jinja's environment caches them. If there are many templates, its cache_size can be raised with the
+setting JINJA2_ENVIRONMENT_OPTIONS.
 """
 from coffin import template
+from coffin.common import env
 from treeio.core.rendering import render_to_string
 from jinja2 import contextfunction, Markup
 from django.template import RequestContext
+from achievements.models import ArchivedAchievement
+from achievements.caching import get_or_set
+from achievements.routers import read
 
 
 register = template.Library()
 
 
-@contextfunction
-def achievements_user_list(context, users, skip_group=False):
+def _get_template(name, response_format='html'):
     """
-    Print a list of users.
+    Get a compiled template from Jinja's environment, which caches it and reloads it when it changes. The name
+    is resolved like tree.io's render_to_string does it.
 
     Arguments:
-    context -- the current Context object, supplied by the decorator
-    users -- a iterable collection of User objects
-    skip_group -- letters to be skipped
+    name -- the name of the template, as used for render_to_string
+    response_format -- the format of the template
+    """
+    if not name.endswith('.' + response_format):
+        name += '.' + response_format
+    return env.get_template('%s/%s' % (response_format, name))
+
+
+def render_with_request_context(name, data, request, response_format):
+    """
+    Render a template the way tree.io usually does, with a new RequestContext.
+
+    Arguments:
+    name -- the name of the template
+    data -- a dictionary with the variables for the template
+    request -- a Django Request object
+    response_format -- defines which format the response should be
+    """
+    return render_to_string(name, data, context_instance=RequestContext(request), response_format=response_format)
+
+
+def _is_admin(context):
+    """
+    Check if the current user is an admin of this module. The lists need to know that for every row, so it's
+    checked once before rendering them.
+
+    Arguments:
+    context -- the current Context object
+    """
+    return context['request'].user.get_profile().is_admin(module_name='achievements')
+
+
+def _render(context, name, data):
+    """
+    Render a template of a tag with the context of the page it is called from.
+
+    Arguments:
+    context -- the current Context object
+    name -- the name of the template
+    data -- a dictionary with the variables for the template
     """
     request = context['request']
 
@@ -28,10 +75,26 @@ def achievements_user_list(context, users, skip_group=False):
     if 'response_format' in context:
         response_format = context['response_format']
 
-    return Markup(render_to_string('achievements/tags/user_list',
-                               {'users': users, 'skip_group': skip_group},
-                               context_instance=RequestContext(request),
-                               response_format=response_format))
+    if response_format != 'html':
+        return render_with_request_context(name, data, request, response_format)
+
+    data.update({'request': request, 'user': context.get('user', request.user), 'response_format': response_format})
+    return _get_template(name, response_format).render(data)
+
+
+@contextfunction
+def achievements_user_list(context, users, skip_group=False):
+    """
+    Print a list of users.
+
+    Arguments:
+    context -- the current Context object, supplied by the decorator
+    users -- a iterable collection of User objects
+    skip_group -- letters to be skipped
+    """
+    return Markup(_render(context, 'achievements/tags/user_list',
+                          {'users': users, 'skip_group': skip_group,
+                           'is_admin': _is_admin(context)}))
 
 register.object(achievements_user_list)
 
@@ -46,16 +109,9 @@ def achievements_achievements_list(context, achievements, skip_group=False):
     achievements -- a iterable collection of Achievement objects
     skip_group -- letters to be skipped
     """
-    request = context['request']
-
-    response_format = 'html'
-    if 'response_format' in context:
-        response_format = context['response_format']
-
-    return Markup(render_to_string('achievements/tags/achievements_list',
-                               {'achievements': achievements, 'skip_group': skip_group},
-                               context_instance=RequestContext(request),
-                               response_format=response_format))
+    return Markup(_render(context, 'achievements/tags/achievements_list',
+                          {'achievements': achievements, 'skip_group': skip_group,
+                           'is_admin': _is_admin(context)}))
 
 register.object(achievements_achievements_list)
 
@@ -70,16 +126,9 @@ def achievements_prototypes_list(context, prototypes, skip_group=False):
     prototypes -- a iterable collection of Prototype objects
     skip_group -- letters to be skipped
     """
-    request = context['request']
-
-    response_format = 'html'
-    if 'response_format' in context:
-        response_format = context['response_format']
-
-    return Markup(render_to_string('achievements/tags/prototypes_list',
-                               {'prototypes': prototypes, 'skip_group': skip_group},
-                               context_instance=RequestContext(request),
-                               response_format=response_format))
+    return Markup(_render(context, 'achievements/tags/prototypes_list',
+                          {'prototypes': prototypes, 'skip_group': skip_group,
+                           'is_admin': _is_admin(context)}))
 
 register.object(achievements_prototypes_list)
 
@@ -96,16 +145,21 @@ def icon_line(context, user=None, size=25):
     """
     request = context['request']
     if not user:
-        user = request.user
+        user = request.user.get_profile()
 
     response_format = 'html'
     if 'response_format' in context:
         response_format = context['response_format']
 
-    achievements = user.achievements.all()[:size]
+    def generate():
+        achievements = list(read(user.achievements.all())[:size])
+        if len(achievements) < size:
+            # expired Achievements are still held
+            achievements += list(read(ArchivedAchievement.objects.filter(
+                user=user, reason__in=ArchivedAchievement.HELD_REASONS))[:size - len(achievements)])
+        return _render(context, 'achievements/tags/icon_line', {'achievements': achievements})
 
-    return Markup(render_to_string('achievements/tags/icon_line', {'achievements': achievements},
-                                   context_instance=RequestContext(request),
-                                   response_format=response_format))
+    # the line only changes when the user gets or loses an Achievement, or when a Prototype changes
+    return Markup(get_or_set('icon_line:%s:%d' % (response_format, size), generate, user=user))
 
-register.object(icon_line)
\ No newline at end of file
+register.object(icon_line)
@@ -6,6 +6,7 @@ from django.conf.urls.defaults import patterns, url
 
 urlpatterns = patterns('achievements.views',
         url(r'^(\.(?P<response_format>\w+))?$', 'index', name='achievements'),
+        url(r'^user/autocomplete/?$', 'user_autocomplete', name='achievements_user_autocomplete'),
         url(r'^user/(?P<user_id>\d+)/(\.(?P<response_format>\w+))?/?$', 'user', name='achievements_user_view'),
         url(r'^add/(\.(?P<response_format>\w+))?/?$', 'achievement_add', name='achievements_achievement_add'),
         url(r'^edit/(?P<achievement_id>\d+)/(\.(?P<response_format>\w+))?/?$', 'achievement_edit',
@@ -23,4 +24,13 @@ urlpatterns = patterns('achievements.views',
             name='achievements_prototype_detail'),
         url(r'^prototype/delete/(?P<prototype_id>\d+)/(\.(?P<response_format>\w+))?/?$', 'prototype_delete',
             name='achievements_prototype_delete'),
+
+        url(r'^search/(\.(?P<response_format>\w+))?/?$', 'search', name='achievements_search'),
+        url(r'^search/autocomplete/?$', 'search_autocomplete', name='achievements_search_autocomplete'),
+)
+
+urlpatterns += patterns('achievements.api',
+        url(r'^api/prototypes/?$', 'prototypes', name='achievements_api_prototypes'),
+        url(r'^api/achievements/?$', 'achievements', name='achievements_api_achievements'),
+        url(r'^api/achievements/revoke/?$', 'revoke', name='achievements_api_revoke'),
 )
@@ -6,33 +6,60 @@ The only thing special are the MassForms, which are quite common in tree.io and
 adapted the code to fit my purposes.
 Also: The forms.py file is in many ways more important since all forms are defined there.
 """
+import json
 from django.template import RequestContext
 from django.utils.translation import ugettext as _
+from django.utils.functional import SimpleLazyObject
 from django.shortcuts import get_object_or_404
 from django.core.urlresolvers import reverse
-from django.http import HttpResponseRedirect
+from django.http import HttpResponseRedirect, HttpResponse
 from treeio.core.models import User
 from treeio.core.rendering import render_to_response
 from treeio.core.decorators import treeio_login_required, handle_response_format
 from achievements.forms import MassActionUserForm, MassActionUserAchievementsForm, MassActionAchievementsForm, \
                                PrototypeForm, AchievementForm
-from achievements.models import Prototype, Achievement
+from achievements.models import Prototype, Achievement, ArchivedAchievement, Progress
+from achievements.routers import read, route_database, pin_session
+from achievements.holders import get_holders, filter_users
+from achievements.archive import archive
+from achievements.search import search_prototypes, search_achievements, autocomplete_prototypes
+
+# how many results the autocompletion returns by default, and how many it returns at most
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_MAX_LIMIT = 50
+# how many Prototypes and Achievements the search shows at most, each
+SEARCH_LIMIT = 50
 
 
 def _get_default_context(request, type):
     """
-    This function generates a context with a prepared massform.
+    This function generates a context with a prepared massform. Only admins get to see the massform, so for
+    everybody else it is None. For admins, the form is only created once the template actually uses it.
 
     Arguments:
     request -- a Django Request object
     type -- the type of MassForm you want
     """
     context = {}
-    massform = type(request.user.get_profile())
+    profile = request.user.get_profile()
+    massform = None
+    if profile.is_admin(module_name='achievements'):
+        massform = SimpleLazyObject(lambda: type(profile))
     context.update({'massform': massform})
     return context
 
 
+def _get_id_list(request, name):
+    """
+    Read a list of ids from the GET parameters, ignoring everything that isn't a number.
+
+    Arguments:
+    request -- a Django Request object
+    name -- the name of the parameter
+    """
+    return [int(value) for value in request.GET.getlist(name) if value.isdigit()]
+
+
 def _process_mass_form(f):
     """
     This decorator checks if and which mass-form type is received and reacts in a proper fashion. (read: saves)
@@ -54,13 +81,16 @@ def _process_mass_form(f):
         **kwargs -- catch kwargs to pass them on afterwards
         """
         user = request.user.get_profile()
+        # the holders of the awarded Prototype, fetched once for all users
+        holders = {}
         # check for massform and check permission
         if 'massform' in request.POST and request.user.get_profile().is_admin(module_name='achievements'):
             for key in request.POST:
                 if 'mass-user' in key:
                     try:
                         user = User.objects.get(pk=request.POST[key])
-                        form = MassActionUserForm(request.user.get_profile(), request.POST, instance=user)
+                        form = MassActionUserForm(request.user.get_profile(), request.POST, instance=user,
+                                                  holders=holders)
                         if form.is_valid():
                             form.save()
                     except Exception:
@@ -91,19 +121,25 @@ def _process_mass_form(f):
 
 @handle_response_format
 @treeio_login_required
+@route_database
 @_process_mass_form
 def index(request, response_format='html'):
     """
     This view displays a list of user, with their achievements (icons). Has a MassForm.
+    The list can be filtered with the GET parameters 'has' and 'missing', both lists of Prototype ids.
 
     Arguments:
     request -- a Django Request object
     response_format -- defines which format the response should be
     """
-    users = User.objects.all()
+    users = read(User.objects.all())
+    has = _get_id_list(request, 'has')
+    missing = _get_id_list(request, 'missing')
+    if has or missing:
+        users = filter_users(users, has=has, missing=missing)
 
     context = _get_default_context(request, MassActionUserForm)
-    context.update({'users': users})
+    context.update({'users': users, 'filtered': bool(has or missing)})
 
     return render_to_response('achievements/index', context, context_instance=RequestContext(request),
                               response_format=response_format)
@@ -111,21 +147,33 @@ def index(request, response_format='html'):
 
 @handle_response_format
 @treeio_login_required
+@route_database
 @_process_mass_form
 def user(request, user_id, response_format='html'):
     """
-    This just displays one user and his achievements. Has a MassForm.
+    This just displays one user and his achievements. Has a MassForm. Expired achievements are shown with the
+    others, the rest of the archive is only fetched if the GET parameter 'archived' is set.
 
     Arguments:
     request -- a Django Request object
     user_id -- the id of the requested User object
     response_format -- defines which format the response should be
     """
-    user = User.objects.get(pk=user_id)
-    achievements = Achievement.objects.filter(user=user)
+    user = read(User.objects).get(pk=user_id)
+    achievements = read(Achievement.objects.filter(user=user))
+    progress = read(Progress.objects.filter(user=user).exclude(prototype__steps='').select_related('prototype'))
+    # the user still holds these, so they are always shown
+    held = read(ArchivedAchievement.objects.filter(user=user, reason__in=ArchivedAchievement.HELD_REASONS)
+                .select_related('prototype'))
+    show_archived = 'archived' in request.GET
+    archived = None
+    if show_archived:
+        archived = read(ArchivedAchievement.objects.filter(user=user).exclude(
+            reason__in=ArchivedAchievement.HELD_REASONS).select_related('prototype'))
 
     context = _get_default_context(request, MassActionUserAchievementsForm)
-    context.update({'u': user, 'achievements': achievements})
+    context.update({'u': user, 'achievements': achievements, 'progress': progress, 'held': held,
+                    'show_archived': show_archived, 'archived': archived})
 
     return render_to_response('achievements/user', context, context_instance=RequestContext(request),
                               response_format=response_format)
@@ -133,6 +181,7 @@ def user(request, user_id, response_format='html'):
 
 @handle_response_format
 @treeio_login_required
+@route_database
 @_process_mass_form
 def prototypes(request, response_format='html'):
     """
@@ -142,7 +191,7 @@ def prototypes(request, response_format='html'):
     request -- a Django Request object
     response_format -- defines which format the response should be
     """
-    prototypes = Prototype.objects.filter(trash=False)
+    prototypes = read(Prototype.objects.filter(trash=False))
 
     context = _get_default_context(request, MassActionAchievementsForm)
     context.update({'protos': prototypes})
@@ -153,6 +202,78 @@ def prototypes(request, response_format='html'):
 
 @handle_response_format
 @treeio_login_required
+@route_database
+def search(request, response_format='html'):
+    """
+    Searches the titles and descriptions of Prototypes as well as the reasons given for Achievements. Only the
+    first SEARCH_LIMIT results of each are shown.
+
+    Arguments:
+    request -- a Django Request object
+    response_format -- defines which format the response should be
+    """
+    query = request.GET.get('q', '').strip()
+    # one more than shown, to know if there are more
+    prototypes = list(read(search_prototypes(query))[:SEARCH_LIMIT + 1])
+    achievements = list(read(search_achievements(query)).select_related('prototype')[:SEARCH_LIMIT + 1])
+    more = len(prototypes) > SEARCH_LIMIT or len(achievements) > SEARCH_LIMIT
+
+    return render_to_response('achievements/search',
+                              {'query': query, 'protos': prototypes[:SEARCH_LIMIT],
+                               'achievements': achievements[:SEARCH_LIMIT], 'more': more},
+                              context_instance=RequestContext(request), response_format=response_format)
+
+
+def _get_autocomplete_limit(request):
+    """
+    Read the number of results an autocompletion wants, capped at AUTOCOMPLETE_MAX_LIMIT.
+
+    Arguments:
+    request -- a Django Request object
+    """
+    try:
+        limit = int(request.GET.get('limit', AUTOCOMPLETE_LIMIT))
+    except ValueError:
+        limit = AUTOCOMPLETE_LIMIT
+    return max(1, min(limit, AUTOCOMPLETE_MAX_LIMIT))
+
+
+@treeio_login_required
+@route_database
+def search_autocomplete(request):
+    """
+    Returns the Prototypes matching what the user has typed so far as JSON, for autocompletion.
+
+    Arguments:
+    request -- a Django Request object
+    """
+    prototypes = autocomplete_prototypes(request.GET.get('term', ''), limit=_get_autocomplete_limit(request))
+    data = [{'id': pk, 'label': title} for pk, title in prototypes]
+    return HttpResponse(json.dumps(data), content_type='application/json')
+
+
+@treeio_login_required
+@route_database
+def user_autocomplete(request):
+    """
+    Returns the Users whose username starts with what the user has typed so far as JSON, for autocompletion.
+    The username is matched because it is unique and therefore indexed, the name of tree.io's User is not.
+
+    Arguments:
+    request -- a Django Request object
+    """
+    term = request.GET.get('term', '').strip()
+    data = []
+    if term:
+        users = read(User.objects.filter(user__username__startswith=term).order_by('user__username'))
+        users = users.values_list('pk', 'name')[:_get_autocomplete_limit(request)]
+        data = [{'id': pk, 'label': name} for pk, name in users]
+    return HttpResponse(json.dumps(data), content_type='application/json')
+
+
+@handle_response_format
+@treeio_login_required
+@route_database
 def prototype_add(request, response_format='html'):
     """
     This delivers a view to create a new Prototype.
@@ -178,6 +299,7 @@ def prototype_add(request, response_format='html'):
 
 @handle_response_format
 @treeio_login_required
+@route_database
 def prototype_edit(request, prototype_id, response_format='html'):
     """
     Opens a form to edit a Prototype.
@@ -208,22 +330,28 @@ def prototype_edit(request, prototype_id, response_format='html'):
 
 @handle_response_format
 @treeio_login_required
+@route_database
 def prototype_detail(request, prototype_id, response_format='html'):
     """
-    Opens a simple overview for one Prototype.
+    Opens a simple overview for one Prototype, including how rare it is.
 
     Arguments:
     request -- a Django Request object
     prototype_id -- the id of the requested Prototype object
     response_format -- defines which format the response should be
     """
-    prototype = get_object_or_404(Prototype, pk=prototype_id)
-    return render_to_response('achievements/prototype_detail', {'prototype': prototype},
+    prototype = get_object_or_404(read(Prototype.objects), pk=prototype_id)
+    holders = len(get_holders(prototype))
+    users = read(User.objects.all()).count()
+    rarity = 100.0 * holders / users if users else 0
+    return render_to_response('achievements/prototype_detail',
+                              {'prototype': prototype, 'holders': holders, 'users': users, 'rarity': rarity},
                               context_instance=RequestContext(request), response_format=response_format)
 
 
 @handle_response_format
 @treeio_login_required
+@route_database
 def prototype_delete(request, prototype_id, response_format='html'):
     """
     Simply deletes a Prototype and redirects to the list. If the permissions are alright, of course.
@@ -235,6 +363,7 @@ def prototype_delete(request, prototype_id, response_format='html'):
     """
     prototype = get_object_or_404(Prototype, pk=prototype_id)
     if request.user.get_profile().has_permission(Prototype, mode='w'):
+        pin_session(request)
         prototype.delete()
     else:
         return HttpResponseRedirect(reverse('achievements_prototype_detail', args=[prototype.id]))
@@ -243,6 +372,7 @@ def prototype_delete(request, prototype_id, response_format='html'):
 
 @handle_response_format
 @treeio_login_required
+@route_database
 def achievement_add(request, response_format='html'):
     """
     Opens an empty form for a new Achievement.
@@ -268,6 +398,7 @@ def achievement_add(request, response_format='html'):
 
 @handle_response_format
 @treeio_login_required
+@route_database
 def achievement_edit(request, achievement_id, response_format='html'):
     """
     Opens a form to edit a specific Achievement.
@@ -295,6 +426,7 @@ def achievement_edit(request, achievement_id, response_format='html'):
 
 @handle_response_format
 @treeio_login_required
+@route_database
 def achievement_detail(request, achievement_id, response_format='html'):
     """
     Opens a simple overview for one Achievement.
@@ -304,16 +436,18 @@ def achievement_detail(request, achievement_id, response_format='html'):
     achievement_id -- the id of the requested Achievement object
     response_format -- defines which format the response should be
     """
-    achievement = get_object_or_404(Achievement, pk=achievement_id)
+    achievement = get_object_or_404(read(Achievement.objects), pk=achievement_id)
     return render_to_response('achievements/achievement_detail', {'achievement': achievement},
                                context_instance=RequestContext(request), response_format=response_format)
 
 
 @handle_response_format
 @treeio_login_required
+@route_database
 def achievement_delete(request, achievement_id, response_format='html'):
     """
-    Simply deletes a Achievement and redirects to the list. If the permissions are alright, of course.
+    Revokes an Achievement (it is moved into the archive) and redirects to the list. If the permissions are
+    alright, of course.
 
     Arguments:
     request -- a Django Request object
@@ -322,7 +456,8 @@ def achievement_delete(request, achievement_id, response_format='html'):
     """
     achievement = get_object_or_404(Achievement, pk=achievement_id)
     if request.user.get_profile().has_permission(Prototype, mode='w'):
-        achievement.delete()
+        pin_session(request)
+        archive(achievement, 'revoked')
     else:
         return HttpResponseRedirect(reverse('achievements_achievement_detail', args=[achievement.id]))
     return HttpResponseRedirect(reverse('achievements'))
@@ -330,6 +465,7 @@ def achievement_delete(request, achievement_id, response_format='html'):
 
 @handle_response_format
 @treeio_login_required
+@route_database
 def widget_achievement_stream(request, response_format='html'):
     """
     Gets the last three Achievements and gives them to the widget template. This will be rendered as the Widget.
@@ -338,6 +474,6 @@ def widget_achievement_stream(request, response_format='html'):
     request -- a Django Request object
     response_format -- defines which format the response should be
     """
-    achievements = Achievement.objects.all()[:3]
+    achievements = read(Achievement.objects.all())[:3]
     return render_to_response('achievements/widgets/newest', {'achievements': achievements},
                                context_instance=RequestContext(request), response_format=response_format)